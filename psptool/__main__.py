@@ -41,14 +41,16 @@ def main():
     parser.add_argument('-c', '--decrypt', help=SUPPRESS, action='store_true')
     parser.add_argument('-k', '--pem-key', help=SUPPRESS, action='store_true')
     parser.add_argument('-n', '--no-duplicates', help=SUPPRESS, action='store_true')
+    parser.add_argument('-p', '--pretty', help=SUPPRESS, action='store_true')
 
     action = parser.add_mutually_exclusive_group(required=False)
 
     action.add_argument('-E', '--entries', help='\n'.join([
         'Default: Parse and display PSP firmware entries.',
-        '[-n]',
+        '[-n] [-p]',
         '',
         '-n:      list unique entries only ordered by their offset',
+        '-p:      render tables via PrettyTable (slower)',
         '', '']), action='store_true')
 
     action.add_argument('-X', '--extract-entry', help='\n'.join([
@@ -77,6 +79,7 @@ def main():
 
     args = parser.parse_args()
     psp = PSPTool.from_file(args.file, verbose=args.verbose)
+    psp.pretty = args.pretty
     output = None
 
     if args.extract_entry:
@@ -85,11 +88,11 @@ def main():
 
             if args.decompress:
                 if not entry.compressed:
-                    print_error_and_exit(f'Entry is not compressed {entry.get_readable_type()}')
+                    print_error_and_exit(f'Entry is not compressed {entry.get_readable_type}')
                 output = entry.get_decompressed()
             elif args.decrypt:
                 if not entry.encrypted:
-                    print_error_and_exit(f'Entry is not encrypted {entry.get_readable_type()}')
+                    print_error_and_exit(f'Entry is not encrypted {entry.get_readable_type}')
                 output = entry.get_decrypted()
             elif args.pem_key:
                 output = entry.get_pem_encoded()
@@ -116,9 +119,9 @@ def main():
                                 out_bytes = entry.get_bytes()
 
                             outdir = args.outfile or f'./{psp.filename}_extracted'
-                            outpath = outdir + '/d%.2d_e%.2d_%s' % (dir_index, entry_index, entry.get_readable_type())
+                            outpath = outdir + '/d%.2d_e%.2d_%s' % (dir_index, entry_index, entry.get_readable_type)
                             if type(entry) is HeaderEntry:
-                                outpath += f'_{entry.get_readable_version()}'
+                                outpath += f'_{entry.get_readable_version}'
 
                             os.makedirs(os.path.dirname(outpath), exist_ok=True)
                             with open(outpath, 'wb') as f:
@@ -135,10 +138,10 @@ def main():
                             out_bytes = entry.get_bytes()
 
                         outdir = args.outfile or f'./{psp.filename}_unique_extracted'
-                        outpath = outdir + '/%s' % (entry.get_readable_type())
+                        outpath = outdir + '/%s' % (entry.get_readable_type)
 
                         if type(entry) is HeaderEntry:
-                            outpath += f'_{entry.get_readable_version()}'
+                            outpath += f'_{entry.get_readable_version}'
 
                         os.makedirs(os.path.dirname(outpath), exist_ok=True)
                         with open(outpath, 'wb') as f:
@@ -149,12 +152,15 @@ def main():
     elif args.replace_entry:
         if args.directory_index is not None and args.entry_index is not None and args.subfile is not None \
                 and args.outfile is not None:
+            # read the subfile into a preallocated buffer, so the blob assignment below is
+            # the only copy that is made of it
             with open(args.subfile, 'rb') as f:
-                    sub_binary = f.read()
+                sub_binary = bytearray(os.fstat(f.fileno()).st_size)
+                sub_size = f.readinto(sub_binary)
 
             entry = psp.blob.fets[0].directories[args.directory_index].entries[args.entry_index]
-            entry.move_buffer(entry.get_address(), len(sub_binary))
-            entry.set_bytes(0, len(sub_binary), sub_binary)
+            entry.move_buffer(entry.get_address(), sub_size)
+            entry.set_bytes(0, sub_size, memoryview(sub_binary)[:sub_size])
 
             psp.to_file(args.outfile)
         else:
@@ -0,0 +1,70 @@
+# PSPTool - Display, extract and manipulate PSP firmware inside UEFI images
+# Copyright (C) 2019 Christian Werling, Robert Buhren
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+""" Magic-pattern scanning over ROM buffers.
+
+find_magic(buffer, magic) returns all offsets of magic within buffer. When numba and
+numpy are installed, the scan loop is JIT-compiled; otherwise it falls back to
+repeated buffer.find() calls, which are still C-level (memchr/memcmp). """
+
+try:
+    import numpy as np
+    from numba import njit
+except ImportError:
+    np = None
+
+
+if np is not None:
+    @njit(cache=True)
+    def _find_magic_jit(buf, magic):
+        first = magic[0]
+        magic_len = magic.shape[0]
+        end = buf.shape[0] - magic_len + 1
+
+        positions = np.empty(8, np.int64)
+        count = 0
+
+        i = 0
+        while i < end:
+            # two-stage: cheap first-byte skip, then full comparison
+            if buf[i] == first:
+                k = 1
+                while k < magic_len and buf[i + k] == magic[k]:
+                    k += 1
+                if k == magic_len:
+                    if count == positions.shape[0]:
+                        grown = np.empty(positions.shape[0] * 2, np.int64)
+                        grown[:count] = positions
+                        positions = grown
+                    positions[count] = i
+                    count += 1
+            i += 1
+
+        return positions[:count]
+
+    def find_magic(buffer, magic):
+        buf = np.frombuffer(buffer, np.uint8)
+        return [int(position) for position in _find_magic_jit(buf, np.frombuffer(magic, np.uint8))]
+else:
+    def find_magic(buffer, magic):
+        positions = []
+
+        position = buffer.find(magic)
+        while position != -1:
+            positions.append(position)
+            position = buffer.find(magic, position + 1)
+
+        return positions
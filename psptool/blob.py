@@ -19,6 +19,7 @@ import struct
 
 from typing import List, Set
 
+from ._scan import find_magic
 from .utils import NestedBuffer, chunker, print_warning
 from .firmware import Firmware
 from .directory import Directory
@@ -33,16 +34,22 @@ class Blob(NestedBuffer):
     class NoFirmwareEntryTableError(Exception):
         pass
 
-    def __init__(self, buffer: bytearray, size: int, psptool):
+    def __init__(self, buffer, size: int, psptool):
         super().__init__(buffer, size)
 
         self.psptool = psptool
         self.raw_blob = buffer
+        self._mv = memoryview(buffer)
 
         self.pubkeys = {}
         self.fets = []
         self.unique_entries = set()
 
+        # (offset, size) of every region modified after parsing; since all nested
+        # buffers resolve their writes through this blob, this covers e.g. the whole
+        # -R replace-entry flow and lets to_file patch files instead of rewriting them
+        self._dirty = []
+
         self._parse_agesa_version()
 
         self._find_entry_table()
@@ -50,6 +57,20 @@ class Blob(NestedBuffer):
     def __repr__(self):
         return f'Blob(agesa_version={self.agesa_version})'
 
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+
+        if isinstance(key, slice):
+            start, stop, _ = key.indices(self.buffer_size)
+            self._dirty.append((start, stop - start))
+        else:
+            self._dirty.append((key, 1))
+
+    def get_mv(self, address: int, size: int):
+        """ Zero-copy view into the blob; slicing a memoryview is O(1), whereas slicing
+        the underlying buffer would copy the range. """
+        return self._mv[address:address + size]
+
     def _parse_agesa_version(self):
         # from https://www.amd.com/system/files/TechDocs/44065_Arch2008.pdf
 
@@ -78,11 +99,10 @@ class Blob(NestedBuffer):
 
     def _find_entry_table(self):
         # AA55AA55 is to unspecific, so we require a word of padding before (to be tested)
-        # TODO: Use better regex to find FET
-        m = re.search(b'\xff\xff\xff\xff' + self._FIRMWARE_ENTRY_MAGIC, self.get_buffer())
-        if m is None:
+        positions = find_magic(self.get_buffer(), b'\xff\xff\xff\xff' + self._FIRMWARE_ENTRY_MAGIC)
+        if not positions:
             raise self.NoFirmwareEntryTableError
-        fet_offset = m.start() + 4
+        fet_offset = positions[0] + 4
         self.fets.append(Fet(self, fet_offset, self.agesa_version))
         if self.dual_rom:
             if self[fet_offset + 0x1000000:fet_offset + 0x1000004] == self._FIRMWARE_ENTRY_MAGIC:
@@ -95,9 +115,8 @@ class Blob(NestedBuffer):
         """ Try to find a pubkey anywhere in the blob.
         The pubkey is identified by it's fingerprint. If found, the pubkey is
         added to the list of pubkeys of the blob """
-        m = re.finditer(re.escape(fp), self.raw_blob)
-        for index in m:
-            start = index.start() - 4
+        for position in find_magic(self.raw_blob, bytes(fp)):
+            start = position - 4
             if int.from_bytes(self.raw_blob[start:start+4], 'little') == 1:
                 # Maybe a pubkey. Determine it's size:
                 pub_exp_size = int.from_bytes(self.raw_blob[start + 0x38: start + 0x3c],
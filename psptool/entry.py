@@ -30,6 +30,8 @@ from IPython import embed
 
 from enum import Enum
 
+from functools import cached_property
+
 from binascii import hexlify
 from base64 import b64encode
 from math import ceil
@@ -46,6 +48,16 @@ from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.primitives import hashes
 from cryptography.exceptions import InvalidSignature
 
+# Precompiled header layouts, so the hot parse paths don't re-parse a format string
+# (and allocate its token tuple) for every single field.
+#   pubkey header (SEV spec B.1): version, key_id, certifying_id, key_usage,
+#   pubexp_size, modulus_size
+_PUBKEY_HEADER = struct.Struct('<I16s16sI16xII')
+#   entry header starting at offset 0x10: magic, size_signed, encrypted, iv, signed,
+#   signature_fingerprint, compressed, size_uncompressed, zlib_size, version (reversed),
+#   load_addr, rom_size, unknown_bool, wrapped_key
+_ENTRY_HEADER = struct.Struct('<4sII4x16sI4x16sI4xII8x4s4xII12xI16s')
+
 
 class Entry(NestedBuffer):
     ENTRY_ALIGNMENT = 0x100
@@ -261,11 +273,15 @@ class Entry(NestedBuffer):
         self.encrypted = False
         self.is_legacy = False
 
+        # precomputed absolute address, so sorting can use a key function instead of
+        # dispatching __lt__/get_address per comparison
+        self.address = self.get_address()
+
 
         try:
             self._parse()
         except (struct.error, AssertionError):
-            print_warning(f"Couldn't parse entry at: 0x{self.get_address():x}. Type: {self.get_readable_type()}. Size 0x{len(self):x}")
+            print_warning(f"Couldn't parse entry at: 0x{self.get_address():x}. Type: {self.get_readable_type}. Size 0x{len(self):x}")
             raise Entry.ParseError()
 
     def __repr__(self):
@@ -285,33 +301,92 @@ class Entry(NestedBuffer):
     def _parse(self):
         pass
 
+    # All derived fields below are memoized: the blob is immutable during a read-only
+    # session, so they only need to be computed once per entry (see invalidate_cache)
+    @cached_property
     def get_readable_type(self):
         if self.type in self.DIRECTORY_ENTRY_TYPES:
             return f'{self.DIRECTORY_ENTRY_TYPES[self.type]}~{hex(self.type)}'
         else:
             return hex(self.type)
 
+    @cached_property
     def get_readable_version(self):
         return ''
 
+    @cached_property
     def get_readable_magic(self):
         return ''
 
+    @cached_property
     def get_readable_signed_by(self):
         return ''
 
+    _CACHED_PROPERTIES = ['md5', 'get_readable_type', 'get_readable_version', 'get_readable_magic',
+                          'get_readable_signed_by', 'verify_signature', 'ls_row']
+
+    @cached_property
+    def ls_row(self):
+        """ All per-entry columns of PSPTool.ls_entries, computed in a single pass. """
+        info = []
+        if self.compressed:
+            info.append('compressed')
+        if self.signed:
+            info.append('signed(%s)' % self.get_readable_signed_by)
+            if self.verify_signature:
+                info.append('verified')
+        if self.is_legacy:
+            info.append('legacy Header')
+        if self.encrypted:
+            info.append('encrypted')
+
+        return [
+            hex(self.get_address()),
+            hex(self.buffer_size),
+            self.get_readable_type,
+            self.get_readable_magic,
+            self.get_readable_version,
+            ', '.join(info),
+            self.md5[:4].upper()
+        ] + self._ls_size_columns()
+
+    def _ls_size_columns(self):
+        return 3 * ['']
+
+    def invalidate_cache(self):
+        """ Drop all memoized values, e.g. after the entry's bytes were replaced. """
+        for name in self._CACHED_PROPERTIES:
+            self.__dict__.pop(name, None)
+
+    def get_bytes(self, offset: int = 0x0, size: int = None):
+        # a zero-copy view into the blob instead of a copying slice; hashlib, zlib and
+        # file writes all accept buffer-protocol objects
+        size = self.buffer_size if size is None else size
+        try:
+            return self.blob.get_mv(self.get_address() + offset, size)
+        except AttributeError:
+            # entries built via from_blob carry a plain NestedBuffer as their blob
+            return super().get_bytes(offset, size)
+
     def shannon_entropy(self):
         return shannon(self[:])
 
+    @cached_property
     def md5(self):
         m = md5()
         m.update(self.get_bytes())
         return m.hexdigest()
 
+    def set_bytes(self, address: int, size: int, value):
+        super().set_bytes(address, size, value)
+        self.invalidate_cache()
+
     def move_buffer(self, new_address, size):
+        self.invalidate_cache()
         current_address = self.get_address()
         move_offset = new_address - current_address
         self.buffer_offset += move_offset
+        self.address = self.get_address()
         self.buffer_size = int(ceil(size / self.ENTRY_ALIGNMENT)) * self.ENTRY_ALIGNMENT
 
         # update all directories' headers that point to this entry
@@ -323,8 +398,11 @@ class PubkeyEntry(Entry):
     def _parse(self):
         """ SEV spec B.1 """
 
-        pubexp_size = struct.unpack('<I', self[0x38:0x3c])[0] // 8
-        modulus_size = signature_size = struct.unpack('<I', self[0x3c:0x40])[0] // 8
+        version, key_id, certifying_id, key_usage, pubexp_size, modulus_size = \
+            _PUBKEY_HEADER.unpack_from(self.get_bytes(0, _PUBKEY_HEADER.size))
+
+        pubexp_size //= 8
+        modulus_size = signature_size = modulus_size // 8
         pubexp_start = 0x40
         modulus_start = pubexp_start + pubexp_size
 
@@ -335,10 +413,10 @@ class PubkeyEntry(Entry):
         self.pubexp = self[pubexp_start:modulus_start][::-1][-4:]
         self.modulus = self[modulus_start:modulus_start + modulus_size][::-1]
 
-        self.version = struct.unpack('<I', self[0x0:0x4])[0]
-        self.key_id = hexlify(self[0x4:0x14])
-        self.certifying_id = hexlify(self[0x14:0x24])
-        self.key_usage = struct.unpack('<I', self[0x24:0x28])[0]
+        self.version = version
+        self.key_id = hexlify(key_id)
+        self.certifying_id = hexlify(certifying_id)
+        self.key_usage = key_usage
 
         expected_size = 0x40 + pubexp_size + modulus_size + signature_size
 
@@ -351,6 +429,7 @@ class PubkeyEntry(Entry):
         else:
             raise Entry.ParseError()
 
+    @cached_property
     def get_readable_magic(self):
         # use this to show the first four characters of the key ID
         return str(self.key_id[:4], encoding='ascii').upper()
@@ -385,21 +464,21 @@ class HeaderEntry(Entry):
         self.header = NestedBuffer(self, HeaderEntry.HEADER_LEN)
 
         # todo: use NestedBuffers instead of saving by value
-        self.magic = self.header[0x10:0x14]
-        self.size_signed = struct.unpack('<I', self.header[0x14:0x18])[0]
-        self.encrypted = struct.unpack('<I', self.header[0x18:0x1c])[0] == 1
-        self.signed = struct.unpack('<I', self.header[0x30:0x34])[0] == 1
-        self.signature_fingerprint = hexlify(self.header[0x38:0x48])
-        self.compressed = struct.unpack('<I', self.header[0x48:0x4c])[0] == 1
-        self.size_uncompressed = struct.unpack('<I', self.header[0x50:0x54])[0]
-        self.version = self.header[0x63:0x5f:-1]
-        self.load_addr = struct.unpack('<I', self.header[0x68:0x6c])[0]
-        self.rom_size = struct.unpack('<I', self.header[0x6c:0x70])[0]
-        self.zlib_size = struct.unpack('<I', self.header[0x54:0x58])[0]
-
-        self.iv = hexlify(self.header[0x20:0x30])
-        self.unknown_bool = struct.unpack('<I', self.header[0x7c:0x80])[0]
-        self.wrapped_key = hexlify(self.header[0x80:0x90])
+        # fetch only the 0x90 bytes the struct covers: entries whose directory-declared
+        # size is below HEADER_LEN would fail the slice bounds check on a full header read
+        (self.magic, self.size_signed, encrypted, iv, signed, signature_fingerprint,
+         compressed, self.size_uncompressed, self.zlib_size, version, self.load_addr,
+         self.rom_size, self.unknown_bool, wrapped_key) = \
+            _ENTRY_HEADER.unpack_from(self.header.get_bytes(0x10, _ENTRY_HEADER.size))
+
+        self.encrypted = encrypted == 1
+        self.signed = signed == 1
+        self.compressed = compressed == 1
+        self.signature_fingerprint = hexlify(signature_fingerprint)
+        self.version = version[::-1]
+
+        self.iv = hexlify(iv)
+        self.wrapped_key = hexlify(wrapped_key)
 
 
         # TODO: Take care of headers with only 0xfff...
@@ -435,7 +514,7 @@ class HeaderEntry(Entry):
                 try:
                     self.pubkey = self.blob.pubkeys[self.signature_fingerprint]
                 except KeyError:
-                    print_warning(f"Couldn't find corresponding key in blob for entry at: 0x{self.get_address():x}. Type: {self.get_readable_type()}")
+                    print_warning(f"Couldn't find corresponding key in blob for entry at: 0x{self.get_address():x}. Type: {self.get_readable_type}")
                     self.signature_len = 0x0
                     self.signed = False
                     return
@@ -496,6 +575,7 @@ class HeaderEntry(Entry):
         self.is_legacy = False
 
 
+    @cached_property
     def get_readable_version(self):
         return '.'.join([hex(b)[2:].upper() for b in self.version])
 
@@ -505,6 +585,7 @@ class HeaderEntry(Entry):
         m.update(ikek.get_bytes())
         return m.digest()
 
+    @cached_property
     def get_readable_magic(self):
         # if self.magic == b'\x01\x00\x00\x00':
             # actually twice as long, but SMURULESMURULES is kinda redundant
@@ -524,9 +605,13 @@ class HeaderEntry(Entry):
 
         return readable_magic
 
+    @cached_property
     def get_readable_signed_by(self):
         return str(self.signature_fingerprint, encoding='ascii').upper()[:4]
 
+    def _ls_size_columns(self):
+        return [hex(value) for value in [self.size_signed, self.size_uncompressed, self.rom_size]]
+
     def get_decompressed(self) -> bytes:
         return self.header.get_bytes() + self.get_decompressed_body()
 
@@ -537,7 +622,7 @@ class HeaderEntry(Entry):
             try:
                 return zlib_decompress(self.body.get_bytes()[:self.zlib_size])
             except:
-                print_warning(f"ZLIB decompression faild on entry {self.get_readable_type()}")
+                print_warning(f"ZLIB decompression faild on entry {self.get_readable_type}")
                 return self.body.get_bytes()
 
     def get_decrypted(self) -> bytes:
@@ -569,12 +654,14 @@ class HeaderEntry(Entry):
     def shannon_entropy(self):
         return shannon(self.body[:])
 
+    @cached_property
     def md5(self):
         m = md5()
         try:
-            m.update(self.body.get_bytes())
+            # equivalent to self.body.get_bytes(), but as a zero-copy view
+            m.update(self.get_bytes(self.header_len, len(self.body)))
         except:
-            print(f"Get bytes failed at entry: 0x{self.get_address():x} type: {self.get_readable_type()} size: 0x{self.buffer_size:x}")
+            print(f"Get bytes failed at entry: 0x{self.get_address():x} type: {self.get_readable_type} size: 0x{self.buffer_size:x}")
         return m.hexdigest()
 
     def sign(self,private_key):
@@ -615,6 +702,7 @@ class HeaderEntry(Entry):
         self.signature = signature
         return True
 
+    @cached_property
     def verify_signature(self):
         # Note: This does not work if an entry was compressed AND encrypted.
         # However, we have not yet seen such entry.
@@ -633,7 +721,7 @@ class HeaderEntry(Entry):
         try:
             pubkey_der_encoded = self.pubkey.get_der_encoded()
         except AttributeError:
-            print_warning(f"Entry {self.get_readable_type()} is signed, but corresponding pubkey was not found ({self.get_readable_signed_by()})")
+            print_warning(f"Entry {self.get_readable_type} is signed, but corresponding pubkey was not found ({self.get_readable_signed_by})")
             return False
 
         crypto_pubkey = load_der_public_key(pubkey_der_encoded, backend=default_backend())
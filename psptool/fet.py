@@ -45,13 +45,17 @@ class Fet(NestedBuffer):
         self._parse_entry_table()
 
     def _determine_size(self):
-        size = 0
-        while self.fet_offset <= len(self.blob) - 4:
-            if self.blob[(self.fet_offset + size):(self.fet_offset + size + 4)] != b'\xff\xff\xff\xff':
-                size += 4
-            else:
-                break
-        self.fet_size = size
+        # The FET is terminated by a padding word (ffffffff). Let find() scan for it at
+        # C-level (memchr/memcmp) instead of comparing one 4-byte slice per iteration,
+        # but only accept word-aligned hits like the FET layout requires.
+        buffer = self.blob.get_buffer()
+        end = buffer.find(b'\xff\xff\xff\xff', self.fet_offset)
+        while end != -1 and (end - self.fet_offset) % 4 != 0:
+            end = buffer.find(b'\xff\xff\xff\xff', end + 1)
+
+        if end == -1:
+            end = len(self.blob)
+        self.fet_size = end - self.fet_offset
 
     def _determine_rom(self):
         self.mask = 0x00FFFFFF
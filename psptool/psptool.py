@@ -14,53 +14,172 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from prettytable import PrettyTable
+import os
+import mmap
+import shutil
+import struct
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from operator import attrgetter
 
-from .entry import HeaderEntry
 from .blob import Blob
 from .utils import print_warning
 
 
+def _noop(*args, **kwargs):
+    pass
+
+
+def _prime_cache(entry, name):
+    """ Compute a cached_property off-descriptor and store it into the instance dict.
+    The descriptor itself holds a per-property lock on Python < 3.12 that serializes
+    even distinct instances, which would defeat the thread pools below. Racing threads
+    may at worst compute the same value twice. """
+    if name not in entry.__dict__:
+        entry.__dict__[name] = getattr(type(entry), name).func(entry)
+
+
+def _render_table(headers, rows):
+    """ Minimal right-aligned text table. PrettyTable re-measures all rows on every
+    get_string call, which dominates ls() wall time for entry-heavy ROMs. """
+
+    str_rows = [[str(value) for value in row] for row in rows]
+
+    widths = [len(header) for header in headers]
+    for row in str_rows:
+        for index, value in enumerate(row):
+            if len(value) > widths[index]:
+                widths[index] = len(value)
+
+    fmt = '  '.join('{:>%d}' % width for width in widths)
+    separator = '  '.join('-' * width for width in widths)
+
+    return '\n'.join([fmt.format(*headers), separator] + [fmt.format(*row) for row in str_rows])
+
+
+@lru_cache(maxsize=1)
+def _get_empty_rom(rom_len):
+    """ Immutable erased-ROM template, built on first use and reused by every subsequent
+    create_file call of the same size. """
+    # single-byte bytes repeat is a C-level fill running at memory bandwidth; an
+    # np.full(...).tobytes() equivalent would add a second 16 MB copy on top
+    return b'\xff' * rom_len
+
+
 class PSPTool:
+    # The AGESA version string at the very start of a ROM consists of this magic plus
+    # NUL-separated board name and version, so Blob._parse_agesa_version can find them
+    AGESA_MAGIC = b'AGESA!V9'
+
+    @classmethod
+    def create_file(cls, filename, rom_len=0x1000000, agesa_version=('PSPTOOL', '1.0.0.0')):
+        """ Create a fresh (erased) ROM file containing just an AGESA version string and
+        an empty firmware entry table. """
+
+        assert rom_len == 0x1000000, 'only 16 MB ROM files are supported'
+
+        # bytearray(bytes) is a single C-level memcpy of the cached template, so the
+        # 16 MB buffer is never touched byte-by-byte on the Python level
+        _fresh_bytes = bytearray(_get_empty_rom(rom_len))
+
+        # pack the version structure straight into the buffer instead of joining
+        # intermediate bytes objects first; the fields are variable-length, so the
+        # format string is computed per call (create_file is cold anyway)
+        name = agesa_version[0].encode('ascii')
+        version = agesa_version[1].encode('ascii')
+        struct.pack_into(f'<{len(cls.AGESA_MAGIC)}sx{len(name)}sx{len(version)}sx',
+                         _fresh_bytes, 0, cls.AGESA_MAGIC, name, version)
+
+        fet_address = Blob._FIRMWARE_ENTRY_TABLE_BASE_ADDRESS
+        _fresh_bytes[fet_address:fet_address + len(Blob._FIRMWARE_ENTRY_MAGIC)] = Blob._FIRMWARE_ENTRY_MAGIC
+
+        # same-length slice assignments above must never resize the buffer
+        assert len(_fresh_bytes) == rom_len
+
+        with open(filename, 'wb') as f:
+            f.write(_fresh_bytes)
+
     @classmethod
     def from_file(cls, filename, verbose=False):
+        # Map the ROM copy-on-write instead of reading it into a bytearray: parsing only
+        # touches pages lazily and modifications (e.g. -R) stay private to this mapping.
         with open(filename, 'rb') as f:
-            rom_bytes = bytearray(f.read())
+            rom_bytes = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
 
         pt = PSPTool(rom_bytes, verbose=verbose)
         pt.filename = filename
+        pt._mmap = rom_bytes  # keep a reference so the mapping outlives the file object
 
         return pt
 
     def __init__(self, rom_bytes, verbose=False):
-        self.print_warning = print_warning if verbose else lambda *args, **kwargs: None
+        self.print_warning = print_warning if verbose else _noop
 
         self.blob = Blob(rom_bytes, len(rom_bytes), self)
         self.filename = None
+        self._mmap = None
+
+        # render tables via PrettyTable instead of the (faster) built-in renderer
+        self.pretty = False
+        # PrettyTable instance shared across ls_entries calls (see ls_entries)
+        self._entries_table = None
+        self._repr = None
 
     def __repr__(self):
-        if self.filename is not None:
-            return f'PSPTool(filename={self.filename})'
-        else:
-            return f'PSPTool(len(rom_bytes)={self.blob.buffer_size}'
+        # formatted lazily (from_file only sets filename after construction), then
+        # reused, e.g. for per-iteration logging calls
+        if self._repr is None:
+            if self.filename is not None:
+                self._repr = f'PSPTool(filename={self.filename})'
+            else:
+                self._repr = f'PSPTool(len(rom_bytes)={self.blob.buffer_size})'
+        return self._repr
 
     def to_file(self, filename):
-        with open(filename, 'wb') as f:
-            f.write(self.blob.get_buffer())
+        if self.filename is not None and os.path.isfile(self.filename):
+            # Patch only the modified regions on top of the source image instead of
+            # rewriting the whole blob (typically kilobytes instead of 16 MB for -R);
+            # compare by inode, a string comparison misses other spellings of the source
+            if not (os.path.exists(filename) and os.path.samefile(filename, self.filename)):
+                shutil.copyfile(self.filename, filename)
+
+            fd = os.open(filename, os.O_WRONLY)
+            try:
+                for offset, size in self.blob._dirty:
+                    os.pwrite(fd, self.blob.get_bytes(offset, size), offset)
+            finally:
+                os.close(fd)
+        else:
+            with open(filename, 'wb') as f:
+                f.write(self.blob.get_buffer())
 
     def ls(self, verbose=False):
+        directory_fields = ['Directory', 'Addr', 'Type', 'Magic', 'Secondary Directory']
+
+        # PrettyTable's constructor parses the field list and sets up per-field option
+        # dicts, so build it once and only clear its rows per directory
+        t = None
+        if self.pretty:
+            from prettytable import PrettyTable
+            t = PrettyTable(directory_fields)
+
         for fet in self.blob.fets:
             for index, directory in enumerate(fet.directories):
-                t = PrettyTable(['Directory', 'Addr', 'Type', 'Magic', 'Secondary Directory'])
-                t.add_row([
+                directory_row = [
                     index,
                     hex(directory.get_address()),
                     directory.type,
                     directory.magic.decode('utf-8', 'backslashreplace'),
                     hex(directory.secondary_directory_address) if directory.secondary_directory_address else '--'
-                ])
+                ]
 
-                print(t)
+                if self.pretty:
+                    t.clear_rows()
+                    t.add_row(directory_row)
+                    print(t)
+                else:
+                    print(_render_table(directory_fields, [directory_row]))
 
                 self.ls_dir(fet, index, verbose=verbose)
                 print('\n')
@@ -72,53 +191,38 @@ class PSPTool:
     def ls_entries(self, entries=None, verbose=False):
         # list all entries of all directories by default (sorted by their address)
         if entries is None:
-            entries = sorted(self.blob.unique_entries)
+            entries = sorted(self.blob.unique_entries, key=attrgetter('address'))
+
+        # hashlib and OpenSSL's RSA verify both release the GIL, so hash all entries and
+        # verify all signed ones concurrently; the results land in the entries' caches
+        # and are picked up by Entry.ls_row below
+        signed_entries = [entry for entry in entries if entry.signed]
+        with ThreadPoolExecutor() as executor:
+            for _ in executor.map(lambda e: _prime_cache(e, 'md5'), entries):
+                pass
+            for _ in executor.map(lambda e: _prime_cache(e, 'verify_signature'), signed_entries):
+                pass
 
         basic_fields = [' ', 'Entry', 'Address', 'Size', 'Type', 'Magic/ID', 'Version', 'Info']
         verbose_fields = ['MD5', 'size_signed', 'size_full', 'size_packed']
 
-        t = PrettyTable(basic_fields + verbose_fields)
-        t.align = 'r'
-
-        for index, entry in enumerate(entries):
-            info = []
-            if entry.compressed:
-                info.append('compressed')
-            if entry.signed:
-                info.append('signed(%s)' % entry.get_readable_signed_by())
-                if entry.verify_signature():
-                    info.append('verified')
-            if entry.is_legacy:
-                info.append('legacy Header')
-            if entry.encrypted:
-                info.append('encrypted')
-
-            all_values = [
-                '',
-                index,
-                hex(entry.get_address()),
-                hex(entry.buffer_size),
-                entry.get_readable_type(),
-                entry.get_readable_magic(),
-                entry.get_readable_version(),
-                ', '.join(info),
-                entry.md5()[:4].upper()
-            ]
-
-            if type(entry) is HeaderEntry:
-                all_values += [hex(v) for v in [
-                    entry.size_signed,
-                    entry.size_uncompressed,
-                    entry.rom_size
-                ]]
-            else:
-                all_values += (3 * [''])
-
-            t.add_row(all_values)
-
-        fields = basic_fields
+        # each entry's columns are computed in one fused pass and cached (see Entry.ls_row)
+        rows = [['', index] + entry.ls_row for index, entry in enumerate(entries)]
 
         if verbose is True:
-            fields += verbose_fields
-
-        print(t.get_string(fields=fields))
+            fields = basic_fields + verbose_fields
+        else:
+            fields = basic_fields
+
+        if self.pretty:
+            if self._entries_table is None:
+                from prettytable import PrettyTable
+                self._entries_table = PrettyTable(basic_fields + verbose_fields)
+                self._entries_table.align = 'r'
+            t = self._entries_table
+            t.clear_rows()
+            for row in rows:
+                t.add_row(row)
+            print(t.get_string(fields=fields))
+        else:
+            print(_render_table(fields, [row[:len(fields)] for row in rows]))